@@ -3,15 +3,16 @@ from __future__ import annotations
 
 import os
 import time
-import threading
 from pathlib import Path
 
 from src.detector import Detector
 from src.voice import Voice
-from src.utils import box_center, box_area, direction_from_center
+from src.tracker import AnnouncementTracker
 from src.camera import select_camera
 from src.ocr import OCRReader
 from src.navigation import NavigationManager
+from src.runtime import Supervisor
+from src.sessionlog import SessionLogger, new_session_dir
 import warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -19,6 +20,7 @@ MODEL_PATH = Path("models/yolov5s.pt")
 CONF_THRESHOLD = 0.35
 ANNOUNCE_COOLDOWN = 2.5
 DISTANCE_SCALING = 1500.0
+SESSION_LOG_DIR = Path("logs")  # binary detection/announcement logs, see src/sessionlog.py
 
 
 def approximate_distance(area):
@@ -37,82 +39,26 @@ def run_detection(voice: Voice, source=None):
         source = select_camera()
 
     detector = Detector(model_path=str(MODEL_PATH), conf=CONF_THRESHOLD, device="cpu")
-    tracked = {}
+    tracker = AnnouncementTracker(approximate_distance, cooldown=ANNOUNCE_COOLDOWN)
+    session_log = SessionLogger(
+        new_session_dir(SESSION_LOG_DIR), detector.names, source=str(source), conf_threshold=CONF_THRESHOLD,
+        announce_cooldown=ANNOUNCE_COOLDOWN, forget_after=tracker.forget_after, distance_scaling=DISTANCE_SCALING,
+    )
 
     try:
-        for frame, results in detector.stream(source=source):
+        for frame_idx, (frame, results) in enumerate(detector.stream(source=source)):
             now = time.time()
             frame_h, frame_w = frame.shape[:2]
 
-            detections = []
-            for r in results:
-                boxes = getattr(r, "boxes", None)
-                if boxes is None or len(boxes) == 0:
-                    continue
-                for box in boxes:
-                    # ultralytics Results boxes
-                    xyxy = box.xyxy
-                    if hasattr(xyxy, "cpu"):
-                        xyxy = xyxy.cpu().numpy()
-                    xyxy = getattr(xyxy, "flatten", lambda: xyxy)().tolist()
-                    if len(xyxy) < 4:
-                        continue
-                    x1, y1, x2, y2 = map(int, xyxy[:4])
-                    conf = float(getattr(box.conf, "item", lambda: box.conf)())
-                    cls_id = int(getattr(box.cls, "item", lambda: box.cls)())
-                    label = detector.names[cls_id] if cls_id < len(detector.names) else str(cls_id)
-
-                    cx, cy = box_center((x1, y1, x2, y2))
-                    area = box_area((x1, y1, x2, y2))
-
-                    detections.append({
-                        "label": label,
-                        "conf": conf,
-                        "box": (x1, y1, x2, y2),
-                        "center": (cx, cy),
-                        "area": area
-                    })
-
-            for det in detections:
-                label = det["label"]
-                center = det["center"]
-                area = det["area"]
-                direction = direction_from_center(center[0], frame_w)
-                dist_est = approximate_distance(area)
-                if dist_est is None:
-                    continue
-
-                key = f"{label}_{round(center[0]/50)}_{round(center[1]/50)}"
-                matched_key = None
-                for k, info in tracked.items():
-                    if not k.startswith(label + "_"):
-                        continue
-                    prev_cx, prev_cy = info["last_center"]
-                    if abs(prev_cx - center[0]) < 80 and abs(prev_cy - center[1]) < 80:
-                        matched_key = k
-                        break
-                if matched_key is None:
-                    matched_key = key
-
-                info = tracked.get(matched_key)
-                announce = False
-                if info is None or (time.time() - info["last_time"] >= ANNOUNCE_COOLDOWN):
-                    announce = True
-                    tracked[matched_key] = {"last_time": time.time(), "last_center": center}
-
-                tracked[matched_key]["last_center"] = center
-
-                if announce:
-                    phrase = f"{label} {direction}, approximately {dist_est:.1f} meters away"
-                    print("ANNOUNCE:", phrase)
-                    voice.speak(phrase)
-
-            # Cleanup
-            to_delete = [k for k, info in tracked.items() if now - info["last_time"] > 6.0]
-            for k in to_delete:
-                del tracked[k]
+            detections = detector.parse(results)
+            phrases = tracker.update(detections, frame_w, now)
+            session_log.log_frame(now, frame_idx, detections, phrases)
+            for phrase in phrases:
+                print("ANNOUNCE:", phrase)
+                voice.speak(phrase)
 
     finally:
+        session_log.close()
         detector.close()
 
 
@@ -124,34 +70,47 @@ def run_ocr(voice: Voice, source=None, languages=None):
 
 
 def run_navigation_with_detection(voice: Voice):
+    if not MODEL_PATH.exists():
+        print(f"Model not found at {MODEL_PATH}. Put yolov5s.pt in models/.")
+        voice.speak("Model file missing.")
+        return
+
     print("Enter origin address (or 'current location' if you plan to start where you are):")
     origin = input("> ").strip()
     print("Enter destination address:")
     destination = input("> ").strip()
-
-    # Start navigation (opens Google Maps + optional API voice guidance)
-    nav = NavigationManager(voice_say=voice.speak, travel_mode="walking")
-    nav.start_navigation(
-        origin=origin,
-        destination=destination,
-        use_api_guidance=True,          # set False to force browser-only mode
-        location_supplier=None,         # provide a callback returning (lat, lon) if you have GPS feed
-        announce_interval=12.0,
-    )
-
-    # Start object detection concurrently
     cam_source = select_camera()
-    det_thread = threading.Thread(target=run_detection, args=(voice, cam_source), daemon=True)
-    det_thread.start()
 
-    voice.speak("Navigation started. Object detection running.")
-    print("Press Ctrl+C to stop navigation + detection.")
+    # Capture, detection, OCR and speech each run in their own process
+    runtime = Supervisor(
+        source=cam_source,
+        model_path=str(MODEL_PATH),
+        conf=CONF_THRESHOLD,
+        announce_cooldown=ANNOUNCE_COOLDOWN,
+        distance_scaling=DISTANCE_SCALING,
+        enable_ocr=True,
+        log_dir=new_session_dir(SESSION_LOG_DIR),
+    )
+    nav = NavigationManager(voice_say=runtime.speak, travel_mode="walking")
     try:
-        while det_thread.is_alive():
-            time.sleep(0.5)
-    except KeyboardInterrupt:
-        pass
+        runtime.start()
+
+        # Start navigation (opens Google Maps + optional API voice guidance); detection is handled by the runtime
+        nav.start_navigation(
+            origin=origin,
+            destination=destination,
+            use_api_guidance=True,          # set False to force browser-only mode
+            location_supplier=None,         # provide a callback returning (lat, lon) if you have GPS feed
+            announce_interval=12.0,
+            detect_objects=False,
+        )
+
+        runtime.speak("Navigation started. Object detection and text reading running.")
+        print("Press Ctrl+C to stop navigation + detection.")
+        runtime.run()
     finally:
+        # run() already stops the runtime; this covers failures during start-up
+        runtime.stop()
         nav.stop()
 
 
@@ -163,7 +122,7 @@ def main():
             print("=== BlindAssist – Feature Menu ===")
             print("1. Object detection with spoken distance/direction")
             print("2. Read text (OCR) from camera")
-            print("3. Voice-guided navigation to a destination (opens Google Maps) + live object detection")
+            print("3. Voice-guided navigation to a destination (opens Google Maps) + live object detection and text reading")
             print("4. Quit")
             choice = input("Select [1-4]: ").strip()
 
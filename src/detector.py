@@ -1,14 +1,52 @@
 import cv2
-from ultralytics import YOLO
+
+from src.utils import box_center, box_area
 
 class Detector:
     def __init__(self, model_path: str, conf: float = 0.35, device: str = "cpu"):
-        self.model = YOLO(model_path)
+        # imported here so importing main.py (as each runtime worker does) stays light
+        from ultralytics import YOLO
+
+        # task is explicit so exported INT8 models (e.g. OpenVINO dirs) load without guessing
+        self.model = YOLO(model_path, task="detect")
         self.conf = conf
         self.device = device
         # names could be list or dict in different UL versions
         self.names = self.model.names
 
+    def detect(self, frame, imgsz=640):
+        return self.model.predict(source=[frame], imgsz=imgsz, conf=self.conf, device=self.device, verbose=False)
+
+    def parse(self, results):
+        """Flatten ultralytics results into dicts with label, conf, box, center and area."""
+        detections = []
+        for r in results:
+            boxes = getattr(r, "boxes", None)
+            if boxes is None or len(boxes) == 0:
+                continue
+            for box in boxes:
+                # ultralytics Results boxes
+                xyxy = box.xyxy
+                if hasattr(xyxy, "cpu"):
+                    xyxy = xyxy.cpu().numpy()
+                xyxy = getattr(xyxy, "flatten", lambda: xyxy)().tolist()
+                if len(xyxy) < 4:
+                    continue
+                x1, y1, x2, y2 = map(int, xyxy[:4])
+                conf = float(getattr(box.conf, "item", lambda: box.conf)())
+                cls_id = int(getattr(box.cls, "item", lambda: box.cls)())
+                label = self.names[cls_id] if cls_id < len(self.names) else str(cls_id)
+
+                detections.append({
+                    "label": label,
+                    "cls": cls_id,
+                    "conf": conf,
+                    "box": (x1, y1, x2, y2),
+                    "center": box_center((x1, y1, x2, y2)),
+                    "area": box_area((x1, y1, x2, y2))
+                })
+        return detections
+
     def stream(self, source=0, show=True, imgsz=640):
         cap = cv2.VideoCapture(source)
         if not cap.isOpened():
@@ -19,7 +57,7 @@ class Detector:
             if not ok:
                 break
 
-            results = self.model.predict(source=[frame], imgsz=imgsz, conf=self.conf, device=self.device, verbose=False)
+            results = self.detect(frame, imgsz=imgsz)
 
             if show:
                 annotated = results[0].plot()
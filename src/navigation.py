@@ -1,17 +1,27 @@
 from __future__ import annotations
-import os, threading, time, webbrowser, urllib.parse, requests, cv2, torch, pyttsx3
+import os, threading, time, webbrowser, urllib.parse, requests
 from typing import Optional, Callable, Dict, Any
 
 # --- TTS engine (offline, no API needed) ---
-_engine = pyttsx3.init()
-_engine.setProperty('rate', 170)
-_engine.setProperty('volume', 1.0)
+# Created on first use: this module is imported by main.py, which every
+# runtime worker process re-imports, and they must not each start an engine.
+_engine = None
+
+def _get_engine():
+    global _engine
+    if _engine is None:
+        import pyttsx3
+        _engine = pyttsx3.init()
+        _engine.setProperty('rate', 170)
+        _engine.setProperty('volume', 1.0)
+    return _engine
 
 def speak(text: str):
     """Speak + print."""
     print(f"ANNOUNCE: {text}")
-    _engine.say(text)
-    _engine.runAndWait()
+    engine = _get_engine()
+    engine.say(text)
+    engine.runAndWait()
 
 # --- Google Maps helpers ---
 def open_gmaps_in_browser(origin: str, destination: str, travel_mode: str = "walking") -> None:
@@ -78,6 +88,7 @@ class NavigationManager:
         location_supplier: Optional[Callable[[], Optional[tuple[float, float]]]] = None,
         announce_interval: float = 10.0,
         camera_index: int = 0,
+        detect_objects: bool = True,
     ):
         open_gmaps_in_browser(origin, destination, self.travel_mode)
         api_key = os.getenv("GOOGLE_MAPS_API_KEY")
@@ -96,11 +107,12 @@ class NavigationManager:
             if use_api_guidance and not api_key:
                 self.voice_say("Tip: set GOOGLE_MAPS_API_KEY for turn-by-turn directions.")
 
-        # Start object detection in parallel
-        self._detect_thread = threading.Thread(
-            target=self._run_detection, args=(camera_index,), daemon=True
-        )
-        self._detect_thread.start()
+        # Start object detection in parallel (skip when a separate detector is already running)
+        if detect_objects:
+            self._detect_thread = threading.Thread(
+                target=self._run_detection, args=(camera_index,), daemon=True
+            )
+            self._detect_thread.start()
 
     def stop(self):
         self._running = False
@@ -146,6 +158,8 @@ class NavigationManager:
             self.voice_say(f"Navigation error: {e}")
 
     def _run_detection(self, camera_index: int = 0):
+        import cv2, torch
+
         try:
             model = torch.hub.load("ultralytics/yolov5", "yolov5s")
             cap = cv2.VideoCapture(camera_index,cv2.CAP_DSHOW)
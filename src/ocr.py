@@ -1,6 +1,4 @@
 import cv2
-import easyocr
-import pyttsx3
 import threading
 import time
 
@@ -11,6 +9,7 @@ from src.navigation import NavigationManager  # use unified navigation
 # =====================
 class Voice:
     def __init__(self):
+        import pyttsx3
         self.engine = pyttsx3.init()
         self.engine.setProperty("rate", 150)
 
@@ -25,8 +24,13 @@ class Voice:
 # =====================
 class OCRReader:
     def __init__(self):
+        import easyocr  # heavy (pulls in torch); only load when a reader is made
         self.reader = easyocr.Reader(["en"], gpu=False)
 
+    def read_frame(self, frame, min_confidence: float = 0.5):
+        """Texts found in a single frame with confidence above min_confidence."""
+        return [text for (_, text, prob) in self.reader.readtext(frame) if prob > min_confidence]
+
     def run_loop(self, source=0, on_text=None):
         cap = cv2.VideoCapture(source)
         while cap.isOpened():
@@ -0,0 +1,423 @@
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+try:
+    import psutil  # optional, only used for resident memory figures
+except ImportError:
+    psutil = None
+
+try:
+    import resource  # POSIX only; peak RSS fallback when psutil has no peak figure
+except ImportError:
+    resource = None
+
+# Classes that matter for walking guidance; accuracy is only reported for these.
+NAV_CLASSES = (
+    "person", "bicycle", "car", "motorcycle", "bus", "truck",
+    "traffic light", "stop sign", "bench", "chair", "dog",
+)
+IOU_THRESHOLD = 0.5
+# Accuracy is scored over the whole precision-recall curve, so predictions are kept
+# down to EVAL_CONF. Recall, latency and the FP32 reference boxes use the threshold
+# the app actually runs at (CONF_THRESHOLD in main.py).
+EVAL_CONF = 0.001
+OPERATING_CONF = 0.35
+
+
+# --- Frame extraction / calibration data ---
+def extract_frames(video, out_dir, every_n: int = 10, max_frames: int = 300) -> List[Path]:
+    """Save every n-th frame of a recorded clip as JPEG, return the file paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cap = cv2.VideoCapture(str(video))
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video source {video}")
+
+    saved = []
+    idx = 0
+    while len(saved) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if idx % every_n == 0:
+            path = out_dir / f"frame_{idx:06d}.jpg"
+            cv2.imwrite(str(path), frame)
+            saved.append(path)
+        idx += 1
+
+    cap.release()
+    return saved
+
+
+def write_calibration_yaml(images_dir, names, yaml_path) -> Path:
+    """Minimal ultralytics dataset file pointing train/val at the calibration frames."""
+    images_dir = Path(images_dir).resolve()
+    names = names if isinstance(names, dict) else dict(enumerate(names))
+    lines = [f"path: {images_dir.as_posix()}", "train: .", "val: .", "names:"]
+    lines += [f"  {i}: {n}" for i, n in sorted(names.items())]
+    yaml_path = Path(yaml_path)
+    yaml_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return yaml_path
+
+
+def check_ultralytics_checkpoint(model_path) -> None:
+    """
+    Reject weights ultralytics would not load as given. Checkpoints from the
+    original yolov5 repo (like models/yolov5n.pt) pickle `models.yolo` classes,
+    and ultralytics silently swaps any local `yolov5[nsmlx].pt` path for the
+    downloaded anchor-free `yolov5?u.pt`, so a different model would be measured.
+    """
+    path = Path(model_path)
+    if path.suffix != ".pt":
+        return
+    if re.fullmatch(r"yolov[35][nsmlx]6?\.pt", path.name):
+        raise RuntimeError(
+            f"{model_path}: ultralytics replaces '{path.name}' with the '{path.stem}u.pt' model. "
+            f"Pass an ultralytics checkpoint explicitly, e.g. --model {path.stem}u.pt."
+        )
+    if path.exists() and zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            pkl = next((n for n in zf.namelist() if n.endswith("data.pkl")), None)
+            data = zf.read(pkl) if pkl else b""
+        if b"models.yolo" in data and b"ultralytics" not in data:
+            raise RuntimeError(
+                f"{model_path} is a checkpoint from the original yolov5 repo, which ultralytics cannot "
+                f"export. Use an ultralytics model such as yolov5nu.pt."
+            )
+
+
+def quantize_model(model_path: str, calib_video, out_dir="models", imgsz: int = 640,
+                   every_n: int = 10, max_frames: int = 300) -> Path:
+    """
+    Post-training INT8 quantization via the OpenVINO exporter.
+    Calibrates on frames sampled from calib_video and returns the exported
+    model directory, which Detector(model_path=...) can load directly.
+    Calibration frames live in a temporary directory that is removed afterwards.
+    """
+    check_ultralytics_checkpoint(model_path)
+    model = YOLO(model_path)
+    with tempfile.TemporaryDirectory(prefix="blindassist-calib-") as work:
+        work = Path(work)
+        frames = extract_frames(calib_video, work / "images", every_n=every_n, max_frames=max_frames)
+        if not frames:
+            raise RuntimeError(f"No calibration frames read from {calib_video}")
+        data_yaml = write_calibration_yaml(work / "images", model.names, work / "calib.yaml")
+
+        exported = Path(model.export(format="openvino", int8=True, data=str(data_yaml), imgsz=imgsz))
+    target = Path(out_dir) / exported.name
+    if exported.resolve() != target.resolve():
+        if target.exists():
+            shutil.rmtree(target)
+        shutil.move(str(exported), str(target))
+    return target
+
+
+# --- Accuracy comparison ---
+def _read_yolo_labels(label_path: Path, frame_w: int, frame_h: int) -> np.ndarray:
+    """YOLO txt labels (cls cx cy w h, normalised) -> rows of [x1, y1, x2, y2, conf=1, cls]."""
+    if not label_path.exists():
+        return np.zeros((0, 6), dtype=np.float32)
+    rows = []
+    for line in label_path.read_text().splitlines():
+        parts = line.split()
+        if len(parts) < 5:
+            continue
+        c, cx, cy, w, h = int(parts[0]), *map(float, parts[1:5])
+        rows.append([(cx - w / 2) * frame_w, (cy - h / 2) * frame_h,
+                     (cx + w / 2) * frame_w, (cy + h / 2) * frame_h, 1.0, c])
+    return np.asarray(rows, dtype=np.float32).reshape(-1, 6)
+
+
+def _predict(model, frames: Sequence[Path], imgsz: int, conf: float) -> List[np.ndarray]:
+    """Run model on every frame; returns per-frame [x1,y1,x2,y2,conf,cls] arrays."""
+    preds = []
+    for path in frames:
+        results = model.predict(source=[cv2.imread(str(path))], imgsz=imgsz, conf=conf, device="cpu", verbose=False)
+        boxes = results[0].boxes
+        preds.append(boxes.data.cpu().numpy() if boxes is not None else np.zeros((0, 6), dtype=np.float32))
+    return preds
+
+
+def _latencies(model, frames: Sequence[Path], imgsz: int, conf: float) -> List[float]:
+    """Per-frame predict time at the operating threshold (NMS cost depends on conf)."""
+    images = [cv2.imread(str(path)) for path in frames]
+    # warm-up so first-call compilation does not skew latency
+    model.predict(source=[images[0]], imgsz=imgsz, conf=conf, device="cpu", verbose=False)
+    latencies = []
+    for frame in images:
+        t0 = time.perf_counter()
+        model.predict(source=[frame], imgsz=imgsz, conf=conf, device="cpu", verbose=False)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def _box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def _class_ap_recall(preds: List[np.ndarray], truths: List[np.ndarray], cls_id: int,
+                     recall_conf: float = OPERATING_CONF):
+    """
+    AP@0.5 (all-point interpolation) over all predictions, and recall counting only
+    predictions at or above recall_conf, for one class. None if the class never occurs.
+    """
+    scores, hits = [], []
+    n_true = 0
+    for p, t in zip(preds, truths):
+        p = p[p[:, 5] == cls_id]
+        t = t[t[:, 5] == cls_id]
+        n_true += len(t)
+        if len(p) == 0:
+            continue
+        p = p[np.argsort(-p[:, 4])]
+        matched = np.zeros(len(t), dtype=bool)
+        iou = _box_iou(p[:, :4], t[:, :4]) if len(t) else np.zeros((len(p), 0))
+        for i in range(len(p)):
+            j = int(np.argmax(iou[i])) if iou.shape[1] else -1
+            hit = j >= 0 and iou[i, j] >= IOU_THRESHOLD and not matched[j]
+            if hit:
+                matched[j] = True
+            scores.append(p[i, 4])
+            hits.append(hit)
+    if n_true == 0:
+        return None
+
+    scores = np.asarray(scores, dtype=np.float64)
+    hits = np.asarray(hits, dtype=bool)
+    recall_at_conf = float(np.count_nonzero(hits & (scores >= recall_conf))) / n_true
+
+    order = np.argsort(-scores)
+    tp = np.cumsum(hits.astype(np.float64)[order])
+    fp = np.cumsum(1.0 - hits.astype(np.float64)[order])
+    recall = tp / n_true
+    precision = tp / np.maximum(tp + fp, 1e-9)
+
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    idx = np.where(mrec[1:] != mrec[:-1])[0]
+    ap = float(np.sum((mrec[idx + 1] - mrec[idx]) * mpre[idx + 1]))
+    return ap, recall_at_conf
+
+
+def _model_size_bytes(path) -> int:
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    """Peak resident memory of this process so far, or None if the platform does not say."""
+    if psutil:
+        peak = getattr(psutil.Process(os.getpid()).memory_info(), "peak_wset", None)  # Windows
+        if peak is not None:
+            return peak
+    if resource:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB on Linux
+    return None
+
+
+def _evaluate(model_path, frames, imgsz, op_conf):
+    """Runs in a fresh process (see _evaluate_isolated), so peak RSS covers this model alone."""
+    model = YOLO(str(model_path), task="detect")
+    preds = _predict(model, frames, imgsz, EVAL_CONF)
+    latencies = _latencies(model, frames, imgsz, op_conf)
+    names = model.names if isinstance(model.names, dict) else dict(enumerate(model.names))
+    rss = _peak_rss_bytes()
+    return names, preds, {
+        "latency_ms": 1000.0 * float(np.median(latencies)),
+        "size_mb": _model_size_bytes(model_path) / 1e6,
+        "rss_mb": rss / 1e6 if rss is not None else None,
+    }
+
+
+def _evaluate_isolated(model_path, frames, imgsz, op_conf):
+    # one spawned process per model: runtimes, imports and freed allocations
+    # from the other model cannot leak into its memory or latency figures
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as ex:
+        return ex.submit(_evaluate, str(model_path), [str(f) for f in frames], imgsz, op_conf).result()
+
+
+def dump_heldout_frames(clip, out_dir, every_n: int = 5, max_frames: int = 200) -> List[Path]:
+    """
+    Save the held-out frames compare_models() will score, for labelling. Files are
+    frame_<index in clip>.jpg; labels go next to them as frame_<index>.txt (YOLO format).
+    """
+    frames = extract_frames(clip, out_dir, every_n=every_n, max_frames=max_frames)
+    if not frames:
+        raise RuntimeError(f"No frames read from {clip}")
+    return frames
+
+
+def compare_models(fp32_path, int8_path, clip, labels_dir=None, imgsz: int = 640,
+                   op_conf: float = OPERATING_CONF, every_n: int = 5, max_frames: int = 200,
+                   classes: Sequence[str] = NAV_CLASSES) -> Dict:
+    """
+    Compare INT8 against FP32 on a held-out clip.
+    With labels_dir (YOLO txt files named like the extracted frames) both models
+    are scored against ground truth and the report has real mAP/recall deltas.
+    Without it there is no ground truth: the report instead gives how well INT8
+    reproduces the FP32 detections kept at op_conf ("agreement"), which is not mAP.
+    """
+    check_ultralytics_checkpoint(fp32_path)
+    with tempfile.TemporaryDirectory(prefix="blindassist-heldout-") as work:
+        # same names and sampling as dump_heldout_frames(), so its labels line up
+        frames = extract_frames(clip, Path(work) / "images", every_n=every_n, max_frames=max_frames)
+        if not frames:
+            raise RuntimeError(f"No frames read from {clip}")
+
+        _, fp32_preds, fp32_perf = _evaluate_isolated(fp32_path, frames, imgsz, op_conf)
+        names, int8_preds, int8_perf = _evaluate_isolated(int8_path, frames, imgsz, op_conf)
+
+        truths = None
+        if labels_dir:
+            truths = []
+            for path in frames:
+                h, w = cv2.imread(str(path)).shape[:2]
+                truths.append(_read_yolo_labels(Path(labels_dir) / f"{path.stem}.txt", w, h))
+
+    name_to_id = {n: i for i, n in names.items()}
+    if truths is None:
+        # FP32 detections the app would actually act on are the reference
+        reference = [p[p[:, 4] >= op_conf] for p in fp32_preds]
+
+    per_class = {}
+    for name in classes:
+        cls_id = name_to_id.get(name)
+        if cls_id is None:
+            continue
+        if truths is not None:
+            fp32_res = _class_ap_recall(fp32_preds, truths, cls_id, op_conf)
+            if fp32_res is None:
+                continue
+            int8_res = _class_ap_recall(int8_preds, truths, cls_id, op_conf)
+            per_class[name] = {
+                "fp32_ap": fp32_res[0], "int8_ap": int8_res[0],
+                "fp32_recall": fp32_res[1], "int8_recall": int8_res[1],
+            }
+        else:
+            res = _class_ap_recall(int8_preds, reference, cls_id, op_conf)
+            if res is None:
+                continue
+            per_class[name] = {"agreement_ap": res[0], "agreement_recall": res[1]}
+
+    def _mean(key):
+        vals = [v[key] for v in per_class.values()]
+        return float(np.mean(vals)) if vals else float("nan")
+
+    report = {
+        "reference": "labels" if truths is not None else "fp32",
+        "frames": len(frames),
+        "op_conf": op_conf,
+        "per_class": per_class,
+        "fp32": fp32_perf, "int8": int8_perf,
+    }
+    keys = ("fp32_ap", "int8_ap", "fp32_recall", "int8_recall") if truths is not None else \
+        ("agreement_ap", "agreement_recall")
+    report.update({f"mean_{k}": _mean(k) for k in keys})
+    return report
+
+
+def print_report(report: Dict) -> None:
+    print(f"\nFrames evaluated: {report['frames']}, recall at conf >= {report['op_conf']}")
+    if report["reference"] == "labels":
+        print("Scored against ground-truth labels.")
+        print(f"{'class':<15}{'AP fp32':>9}{'AP int8':>9}{'dAP':>8}{'R fp32':>9}{'R int8':>9}{'dR':>8}")
+        rows = list(report["per_class"].items())
+        rows.append(("mean", {k: report[f"mean_{k}"] for k in ("fp32_ap", "int8_ap", "fp32_recall", "int8_recall")}))
+        for name, m in rows:
+            print(f"{name:<15}{m['fp32_ap']:>9.3f}{m['int8_ap']:>9.3f}{m['int8_ap'] - m['fp32_ap']:>+8.3f}"
+                  f"{m['fp32_recall']:>9.3f}{m['int8_recall']:>9.3f}{m['int8_recall'] - m['fp32_recall']:>+8.3f}")
+    else:
+        print("No labels: agreement of INT8 with the FP32 detections (not mAP; pass --labels for that).")
+        print(f"{'class':<15}{'agree AP':>10}{'agree R':>10}")
+        for name, m in report["per_class"].items():
+            print(f"{name:<15}{m['agreement_ap']:>10.3f}{m['agreement_recall']:>10.3f}")
+        print(f"{'mean':<15}{report['mean_agreement_ap']:>10.3f}{report['mean_agreement_recall']:>10.3f}")
+
+    fp, q = report["fp32"], report["int8"]
+    print(f"\nLatency (median): {fp['latency_ms']:.1f} ms -> {q['latency_ms']:.1f} ms "
+          f"({fp['latency_ms'] / max(q['latency_ms'], 1e-9):.2f}x)")
+    print(f"Model size:       {fp['size_mb']:.1f} MB -> {q['size_mb']:.1f} MB")
+    if fp["rss_mb"] is not None:
+        print(f"Peak memory:      {fp['rss_mb']:.1f} MB -> {q['rss_mb']:.1f} MB (own process each)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="INT8 post-training quantization with accuracy check.")
+    ap.add_argument("--model", default="yolov5nu.pt",
+                    help="FP32 ultralytics weights to quantize (models/yolov5n.pt is a yolov5-repo checkpoint and is rejected)")
+    ap.add_argument("--calib", help="recorded clip used for calibration")
+    ap.add_argument("--heldout", required=True, help="separate clip used for the accuracy comparison")
+    ap.add_argument("--heldout-every", type=int, default=5, help="use every n-th frame of the held-out clip")
+    ap.add_argument("--heldout-max", type=int, default=200, help="at most this many held-out frames")
+    ap.add_argument("--dump-frames", metavar="DIR", default=None,
+                    help="only write the held-out frames to DIR (frame_<index>.jpg) for labelling, then exit")
+    ap.add_argument("--labels", default=None,
+                    help="YOLO label dir for the held-out frames (frame_<index>.txt, same sampling flags)")
+    ap.add_argument("--out", default="models", help="where to write the INT8 model")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--max-map-drop", type=float, default=0.05,
+                    help="with --labels: fail if navigation-class mAP drops by more than this")
+    ap.add_argument("--min-agreement", type=float, default=0.90,
+                    help="without --labels: fail if INT8 agreement AP with FP32 is below this")
+    args = ap.parse_args()
+
+    if args.dump_frames:
+        frames = dump_heldout_frames(args.heldout, args.dump_frames, every_n=args.heldout_every,
+                                     max_frames=args.heldout_max)
+        print(f"Wrote {len(frames)} frames to {args.dump_frames}. Label them as frame_<index>.txt and pass "
+              f"--labels with the same --heldout-every/--heldout-max.")
+        return
+    if not args.calib:
+        ap.error("--calib is required unless --dump-frames is given")
+
+    int8_path = quantize_model(args.model, args.calib, out_dir=args.out, imgsz=args.imgsz)
+    print(f"INT8 model written to {int8_path}")
+
+    report = compare_models(args.model, int8_path, args.heldout, labels_dir=args.labels, imgsz=args.imgsz,
+                            every_n=args.heldout_every, max_frames=args.heldout_max)
+    print_report(report)
+
+    if not report["per_class"]:
+        print("\nFAIL: no navigation-relevant objects in the held-out clip, nothing to compare.")
+        raise SystemExit(1)
+    if report["reference"] == "labels":
+        drop = report["mean_fp32_ap"] - report["mean_int8_ap"]
+        if drop > args.max_map_drop:
+            print(f"\nFAIL: mAP dropped by {drop:.3f} (> {args.max_map_drop}). Keep the FP32 model.")
+            raise SystemExit(1)
+    elif report["mean_agreement_ap"] < args.min_agreement:
+        print(f"\nFAIL: agreement with FP32 is {report['mean_agreement_ap']:.3f} (< {args.min_agreement}). "
+              f"Keep the FP32 model, or check with --labels.")
+        raise SystemExit(1)
+    print(f"\nOK: use it with Detector(model_path=\"{int8_path.as_posix()}\").")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+from __future__ import annotations
+
+import os
+import queue
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+_HEADER_ALIGN = 64
+
+
+# =====================
+# Shared-memory frame ring
+# =====================
+class SharedFrameRing:
+    """
+    Fixed-size ring of BGR frames in one shared memory block, one writer and up
+    to `readers` readers. Header (int64):
+    [latest_seq, latest_slot, seq of each slot..., slot pinned by each reader...].
+    A reader pins the slot it is working on and the writer never reuses a pinned
+    slot or the latest one, so a frame stays intact however slow its reader is.
+    """
+    def __init__(self, shape=(480, 640, 3), slots: int = 8, readers: int = 2, name: Optional[str] = None):
+        if slots < readers + 2:
+            raise ValueError(f"need at least {readers + 2} slots for {readers} readers, got {slots}")
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.readers = readers
+        header_len = 2 + slots + readers
+        header_bytes = -(-8 * header_len // _HEADER_ALIGN) * _HEADER_ALIGN
+        frame_bytes = int(np.prod(self.shape))
+        create = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=header_bytes + slots * frame_bytes)
+        self.header = np.ndarray((header_len,), dtype=np.int64, buffer=self.shm.buf)
+        self.slot_seq = self.header[2:2 + slots]
+        self.pins = self.header[2 + slots:]
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=header_bytes)
+        self._next = 0
+        if create:
+            self.header[:] = 0
+            self.header[1] = -1
+            self.pins[:] = -1
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, slots, readers = spec
+        return cls(shape=shape, slots=slots, readers=readers, name=name)
+
+    def spec(self):
+        """Picklable description passed to worker processes."""
+        return self.shm.name, self.shape, self.slots, self.readers
+
+    def claim(self):
+        """(slot, view) to write the next frame into; fill the view, then publish(slot)."""
+        latest_slot = int(self.header[1])
+        for i in range(self.slots):
+            slot = (self._next + i) % self.slots
+            if slot == latest_slot:
+                continue
+            # invalidate first, then check pins; a reader pinning concurrently sees -1 and retries
+            old = int(self.slot_seq[slot])
+            self.slot_seq[slot] = -1
+            if slot in self.pins:
+                self.slot_seq[slot] = old
+                continue
+            self._next = slot + 1
+            return slot, self.frames[slot]
+        raise RuntimeError("no free frame slot")  # unreachable while slots >= readers + 2
+
+    def publish(self, slot: int) -> int:
+        seq = int(self.header[0]) + 1
+        self.slot_seq[slot] = seq
+        self.header[1] = slot
+        self.header[0] = seq
+        return seq
+
+    def acquire(self, reader: int, after: int = 0):
+        """
+        Pin and return (seq, frame view) of the newest frame newer than `after`,
+        or None. No copy is made; the view stays valid until release(reader).
+        """
+        while True:
+            seq, slot = int(self.header[0]), int(self.header[1])
+            if seq <= after or slot < 0:
+                return None
+            self.pins[reader] = slot
+            if int(self.slot_seq[slot]) == seq:
+                return seq, self.frames[slot]
+            self.pins[reader] = -1  # writer moved on between the reads, try again
+
+    def release(self, reader: int):
+        self.pins[reader] = -1
+
+    def close(self):
+        # drop numpy views first, otherwise the buffer cannot be released
+        self.header = self.slot_seq = self.pins = self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# Reader index of each frame consumer in SharedFrameRing
+READERS = {"detection": 0, "ocr": 1}
+
+# Spoken when a worker has used up its restarts, so the user knows what no longer works
+GIVE_UP_WARNINGS = {
+    "capture": "Warning: camera lost. Obstacle detection has stopped.",
+    "detection": "Warning: obstacle detection has stopped.",
+    "ocr": "Text reading has stopped.",
+}
+
+
+def _offer(q, item):
+    """Non-blocking put that drops the oldest queued item when full, so what is left stays fresh."""
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try:
+            # short timeout: queued items may still be in the feeder thread, not the pipe
+            q.get(timeout=0.05)
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            pass
+
+
+# =====================
+# Workers (top-level so they can be spawned on Windows)
+# =====================
+def capture_worker(source, ring_spec, stop):
+    ring = SharedFrameRing.attach(ring_spec)
+    cap = cv2.VideoCapture(source)
+    try:
+        if not cap.isOpened():
+            raise RuntimeError(f"Cannot open video source {source}")
+        height, width = ring.shape[:2]
+        while not stop.is_set():
+            slot_idx, slot = ring.claim()
+            # decode straight into shared memory when the camera size matches
+            ok, frame = cap.read(slot)
+            if not ok:
+                if isinstance(source, str) and os.path.isfile(source):
+                    return  # end of recorded clip
+                raise RuntimeError(f"Lost video source {source}")
+            if not np.shares_memory(frame, slot):
+                # only if the source changed size after start-up (e.g. an IP camera reconnect)
+                cv2.resize(frame, (width, height), dst=slot)
+            ring.publish(slot_idx)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cap.release()
+        ring.close()
+
+
+def detection_worker(ring_spec, detections_q, speech_q, stop, model_path, conf, cooldown, distance_scaling,
+                     log_dir=None):
+    from src.detector import Detector
+    from src.sessionlog import SessionLogger
+    from src.tracker import FORGET_AFTER, AnnouncementTracker
+
+    def distance(area):
+        return distance_scaling / (area ** 0.5) if area > 0 else None
+
+    reader = READERS["detection"]
+    ring = SharedFrameRing.attach(ring_spec)
+    detector = Detector(model_path=model_path, conf=conf, device="cpu")
+    # appends to the same files if this worker is restarted, continuing its frame and track numbering
+    session_log = SessionLogger(
+        log_dir, detector.names, conf_threshold=conf, announce_cooldown=cooldown,
+        forget_after=FORGET_AFTER, distance_scaling=distance_scaling,
+    ) if log_dir else None
+    tracker = AnnouncementTracker(distance, cooldown=cooldown, first_id=session_log.next_track if session_log else 0)
+    processed = session_log.next_frame if session_log else 0
+    last = 0
+    try:
+        while not stop.is_set():
+            item = ring.acquire(reader, last)
+            if item is None:
+                time.sleep(0.005)
+                continue
+            seq, frame = item
+            try:
+                results = detector.detect(frame)
+            finally:
+                ring.release(reader)
+            last = seq
+            now = time.time()
+            detections = detector.parse(results)
+            phrases = tracker.update(detections, ring.shape[1], now)
+            if session_log:
+                session_log.log_frame(now, processed, detections, phrases)
+            processed += 1
+            if detections_q is not None:
+                _offer(detections_q, (seq, now, detections))
+            for phrase in phrases:
+                _offer(speech_q, phrase)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if session_log:
+            session_log.close()
+        detector.close()
+        ring.close()
+
+
+def ocr_worker(ring_spec, speech_q, stop, min_confidence, cooldown):
+    from src.ocr import OCRReader
+
+    reader_idx = READERS["ocr"]
+    ring = SharedFrameRing.attach(ring_spec)
+    reader = OCRReader()
+    last_spoken: Dict[str, float] = {}
+    last = 0
+    try:
+        while not stop.is_set():
+            item = ring.acquire(reader_idx, last)
+            if item is None:
+                time.sleep(0.01)
+                continue
+            seq, frame = item
+            try:
+                texts = reader.read_frame(frame, min_confidence=min_confidence)
+            finally:
+                ring.release(reader_idx)
+            last = seq
+            now = time.time()
+            for text in texts:
+                if now - last_spoken.get(text, 0.0) >= cooldown:
+                    last_spoken[text] = now
+                    _offer(speech_q, text)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+def speech_worker(speech_q, nav_q, stop):
+    """
+    Speaks one phrase at a time, synchronously, so a backlog can only build up
+    in the bounded speech_q (where _offer drops the oldest). Navigation
+    instructions come through nav_q, are never dropped and go first.
+    """
+    import pyttsx3
+
+    engine = pyttsx3.init()
+    try:
+        engine.setProperty("rate", 160)
+        engine.setProperty("volume", 1.0)
+    except Exception:
+        pass
+    try:
+        while not stop.is_set():
+            try:
+                text = nav_q.get_nowait()
+            except queue.Empty:
+                try:
+                    text = speech_q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            print("ANNOUNCE:", text)
+            try:
+                engine.say(text)
+                engine.runAndWait()
+            except Exception as e:
+                print("TTS error:", e)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            engine.stop()
+        except Exception:
+            pass
+
+
+# =====================
+# Supervisor
+# =====================
+class Supervisor:
+    """
+    Runs capture, detection, OCR and speech as separate processes.
+    Frames go through a SharedFrameRing, detections and speech requests over
+    bounded queues; navigation phrases from speak() use their own unbounded
+    queue. Workers that die with a non-zero exit code are restarted with
+    exponential backoff; one that fails more than max_restarts times within
+    restart_window seconds is given up on, with a spoken warning.
+    With log_dir set, the detection worker writes a SessionLogger log there.
+    """
+    def __init__(self, source, model_path: str, conf: float = 0.35, announce_cooldown: float = 2.5,
+                 distance_scaling: float = 1500.0, frame_shape=None, slots: int = 8,
+                 enable_ocr: bool = True, ocr_min_confidence: float = 0.45, ocr_cooldown: float = 2.0,
+                 max_restarts: int = 5, restart_window: float = 60.0, backoff: float = 0.5,
+                 max_backoff: float = 10.0, on_detections: Optional[Callable] = None, log_dir=None):
+        self.ctx = mp.get_context("spawn")
+        self.source = source
+        self.frame_shape = frame_shape
+        self.slots = slots
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.on_detections = on_detections
+        self.stop_event = self.ctx.Event()
+        # only published when someone consumes them, otherwise each frame's
+        # detections would be pickled into a queue nobody reads
+        self.detections_q = self.ctx.Queue(maxsize=32) if on_detections else None
+        self.speech_q = self.ctx.Queue(maxsize=3)
+        self.nav_q = self.ctx.Queue()
+        self.ring: Optional[SharedFrameRing] = None
+
+        self._specs = {
+            "speech": (speech_worker, lambda: (self.speech_q, self.nav_q, self.stop_event)),
+            "capture": (capture_worker, lambda: (self.source, self.ring.spec(), self.stop_event)),
+            "detection": (detection_worker, lambda: (
+                self.ring.spec(), self.detections_q, self.speech_q, self.stop_event,
+                model_path, conf, announce_cooldown, distance_scaling, log_dir)),
+        }
+        if enable_ocr:
+            self._specs["ocr"] = (ocr_worker, lambda: (
+                self.ring.spec(), self.speech_q, self.stop_event, ocr_min_confidence, ocr_cooldown))
+        self._procs: Dict[str, mp.process.BaseProcess] = {}
+        self._failures: Dict[str, List[float]] = {name: [] for name in self._specs}
+        self._pending: Dict[str, float] = {}  # worker -> monotonic time its restart is due
+
+    def speak(self, text: str):
+        """Queue a navigation phrase for the speech worker (usable as NavigationManager's voice_say)."""
+        if text:
+            self.nav_q.put(text)
+
+    def _spawn(self, name: str):
+        target, args = self._specs[name]
+        p = self.ctx.Process(target=target, args=args(), name=f"blindassist-{name}", daemon=True)
+        p.start()
+        self._procs[name] = p
+
+    def _probe_frame_shape(self):
+        """
+        Native frame size of the source. Distances are estimated from pixel area,
+        so frames must not be rescaled or option 3 would disagree with run_detection.
+        """
+        cap = cv2.VideoCapture(self.source)
+        try:
+            w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if w <= 0 or h <= 0:
+                # some IP streams only report their size once a frame is decoded
+                ok, frame = cap.read()
+                if ok:
+                    h, w = frame.shape[:2]
+        finally:
+            cap.release()
+        if w <= 0 or h <= 0:
+            print(f"[runtime] Could not read the frame size of {self.source}, assuming 640x480.")
+            return (480, 640, 3)
+        return (h, w, 3)
+
+    def start(self):
+        if self.frame_shape is None:
+            self.frame_shape = self._probe_frame_shape()
+        self.ring = SharedFrameRing(shape=self.frame_shape, slots=self.slots, readers=len(READERS))
+        for name in self._specs:
+            self._spawn(name)
+
+    def poll(self) -> bool:
+        """Drain detections and restart crashed workers. False once capture has finished."""
+        while self.detections_q is not None:
+            try:
+                item = self.detections_q.get_nowait()
+            except queue.Empty:
+                break
+            self.on_detections(*item)
+
+        if self.stop_event.is_set():
+            return True
+        now = time.monotonic()
+        for name, due in list(self._pending.items()):
+            if now >= due:
+                del self._pending[name]
+                self._spawn(name)
+
+        for name, p in list(self._procs.items()):
+            if p.is_alive():
+                continue
+            del self._procs[name]
+            if p.exitcode == 0:
+                if name == "capture":
+                    return False
+                continue
+            if name in READERS:
+                self.ring.release(READERS[name])  # it may have died holding a frame
+
+            failures = [t for t in self._failures[name] if now - t < self.restart_window] + [now]
+            self._failures[name] = failures
+            if len(failures) > self.max_restarts:
+                print(f"[runtime] {name} worker failed {len(failures)} times in "
+                      f"{self.restart_window:.0f}s, giving up.")
+                if name in GIVE_UP_WARNINGS:
+                    self.speak(GIVE_UP_WARNINGS[name])
+                continue
+            delay = min(self.backoff * 2 ** (len(failures) - 1), self.max_backoff)
+            print(f"[runtime] {name} worker exited with code {p.exitcode}, restarting in {delay:.1f}s "
+                  f"({len(failures)}/{self.max_restarts} in {self.restart_window:.0f}s).")
+            self._pending[name] = now + delay
+        return True
+
+    def run(self, keep_running: Callable[[], bool] = lambda: True, interval: float = 0.2):
+        try:
+            while keep_running() and self.poll():
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.stop_event.set()
+        for p in self._procs.values():
+            p.join(timeout=3.0)
+            if p.is_alive():
+                p.terminate()
+                p.join(timeout=1.0)
+        self._procs.clear()
+        self._pending.clear()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
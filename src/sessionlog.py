@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.tracker import FORGET_AFTER, AnnouncementTracker
+
+# Fixed-width little-endian records, so files can be memory-mapped directly.
+DETECTION_DTYPE = np.dtype([
+    ("t", "<f8"),        # unix time
+    ("frame", "<u4"),    # index of the processed frame, consecutive including frames without detections
+    ("track", "<i4"),    # -1 if not tracked
+    ("cls", "<u2"),
+    ("x1", "<i2"), ("y1", "<i2"), ("x2", "<i2"), ("y2", "<i2"),
+    ("conf", "<f4"),
+    ("distance", "<f4"),  # NaN if unknown
+])
+ANNOUNCEMENT_DTYPE = np.dtype([
+    ("t", "<f8"),
+    ("frame", "<u4"),
+    ("track", "<i4"),
+    ("cls", "<u2"),
+    ("text", "S94"),     # utf-8, truncated
+])
+FORMAT_VERSION = 1
+
+DETECTIONS_FILE = "detections.bin"
+ANNOUNCEMENTS_FILE = "announcements.bin"
+META_FILE = "meta.json"
+PROGRESS_FILE = "progress.json"  # frames processed so far, including frames without detections
+
+
+def new_session_dir(root="logs") -> Path:
+    return Path(root) / time.strftime("session-%Y%m%d-%H%M%S")
+
+
+# =====================
+# Writer
+# =====================
+def _open_for_append(path: Path, dtype):
+    """
+    Open a record file for appending, first cutting off a partial trailing
+    record (left by a process killed mid-write) so new records stay aligned.
+    """
+    if path.exists():
+        size = path.stat().st_size
+        if size % dtype.itemsize:
+            os.truncate(path, size - size % dtype.itemsize)
+    return open(path, "ab")
+
+
+class SessionLogger:
+    """
+    Append-only binary log of per-frame detections and announcements.
+    Records are buffered in numpy arrays and written when batch_size is reached
+    or flush_interval seconds have passed, whichever comes first.
+    Extra keyword arguments (thresholds, cooldowns, forget_after, ...) are stored
+    in meta.json.
+    """
+    def __init__(self, log_dir, names, batch_size: int = 1024, flush_interval: float = 2.0, **meta):
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        names = names if isinstance(names, dict) else dict(enumerate(names))
+
+        meta_path = self.log_dir / META_FILE
+        if not meta_path.exists():
+            meta_path.write_text(json.dumps({
+                "version": FORMAT_VERSION,
+                "started": time.time(),
+                "names": {str(k): v for k, v in names.items()},
+                **meta,
+            }, indent=2), encoding="utf-8")
+
+        self._det_file = _open_for_append(self.log_dir / DETECTIONS_FILE, DETECTION_DTYPE)
+        self._ann_file = _open_for_append(self.log_dir / ANNOUNCEMENTS_FILE, ANNOUNCEMENT_DTYPE)
+        # frame index and track id to continue from when reopening a log (e.g. a restarted worker)
+        dets = _map(self.log_dir / DETECTIONS_FILE, DETECTION_DTYPE)
+        anns = _map(self.log_dir / ANNOUNCEMENTS_FILE, ANNOUNCEMENT_DTYPE)
+        self.next_frame = max(_read_progress(self.log_dir), int(dets["frame"][-1]) + 1 if len(dets) else 0)
+        self.next_track = max(int(dets["track"].max()) + 1 if len(dets) else 0,
+                              int(anns["track"].max()) + 1 if len(anns) else 0)
+        del dets, anns
+        self._frames = self.next_frame
+        self._det_buf = np.zeros(batch_size, dtype=DETECTION_DTYPE)
+        self._ann_buf = np.zeros(max(batch_size // 16, 16), dtype=ANNOUNCEMENT_DTYPE)
+        self._det_n = 0
+        self._ann_n = 0
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+
+    def log_frame(self, t: float, frame: int, detections, phrases=()):
+        """
+        Record one frame of Detector.parse() output after AnnouncementTracker.update().
+        phrases are matched, in order, to the detections flagged "announced".
+        Call it for frames without detections too, so frame indices stay consecutive
+        across restarts.
+        """
+        self._frames = max(self._frames, frame + 1)
+        for det in detections:
+            if self._det_n == len(self._det_buf):
+                self._flush_detections()
+            x1, y1, x2, y2 = det["box"]
+            dist = det.get("distance")
+            self._det_buf[self._det_n] = (
+                t, frame, det.get("track", -1), det.get("cls", 0), x1, y1, x2, y2,
+                det["conf"], np.nan if dist is None else dist,
+            )
+            self._det_n += 1
+
+        announced = [d for d in detections if d.get("announced")]
+        for det, text in zip(announced, phrases):
+            self.log_announcement(t, frame, text, track=det.get("track", -1), cls=det.get("cls", 0))
+        self._flush_if_due()
+
+    def log_announcement(self, t: float, frame: int, text: str, track: int = -1, cls: int = 0):
+        if self._ann_n == len(self._ann_buf):
+            self._flush_announcements()
+        encoded = text.encode("utf-8")[:ANNOUNCEMENT_DTYPE["text"].itemsize]
+        self._ann_buf[self._ann_n] = (t, frame, track, cls, encoded)
+        self._ann_n += 1
+        self._flush_if_due()
+
+    def _flush_if_due(self):
+        # bounds what a crash or terminate() can lose, whatever the detection rate
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _flush_detections(self):
+        if self._det_n:
+            self._det_file.write(self._det_buf[:self._det_n].tobytes())
+            self._det_n = 0
+
+    def _flush_announcements(self):
+        if self._ann_n:
+            self._ann_file.write(self._ann_buf[:self._ann_n].tobytes())
+            self._ann_n = 0
+
+    def flush(self):
+        self._flush_detections()
+        self._flush_announcements()
+        self._det_file.flush()
+        self._ann_file.flush()
+        # written after the records it covers, and replaced atomically
+        tmp = self.log_dir / (PROGRESS_FILE + ".tmp")
+        tmp.write_text(json.dumps({"frames": self._frames}), encoding="utf-8")
+        os.replace(tmp, self.log_dir / PROGRESS_FILE)
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self._det_file.close()
+        self._ann_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# =====================
+# Reader
+# =====================
+def _read_progress(log_dir: Path) -> int:
+    try:
+        return int(json.loads((log_dir / PROGRESS_FILE).read_text(encoding="utf-8"))["frames"])
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def _map(path: Path, dtype) -> np.ndarray:
+    # a truncated trailing record (e.g. crash mid-write) is ignored
+    count = path.stat().st_size // dtype.itemsize if path.exists() else 0
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class SessionLog:
+    """Read-only, memory-mapped view of a SessionLogger directory."""
+    def __init__(self, log_dir):
+        self.log_dir = Path(log_dir)
+        self.meta = json.loads((self.log_dir / META_FILE).read_text(encoding="utf-8"))
+        self.names: Dict[int, str] = {int(k): v for k, v in self.meta.get("names", {}).items()}
+        self.detections = _map(self.log_dir / DETECTIONS_FILE, DETECTION_DTYPE)
+        self.announcements = _map(self.log_dir / ANNOUNCEMENTS_FILE, ANNOUNCEMENT_DTYPE)
+
+    def class_id(self, label: str) -> int:
+        for k, v in self.names.items():
+            if v == label:
+                return k
+        raise KeyError(label)
+
+    def select(self, label: Optional[str] = None, min_conf: float = 0.0, track: Optional[int] = None,
+               start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """Detections matching all given filters (start/end in seconds from the first record)."""
+        d = self.detections
+        mask = d["conf"] >= min_conf
+        if label is not None:
+            mask &= d["cls"] == self.class_id(label)
+        if track is not None:
+            mask &= d["track"] == track
+        if len(d) and (start is not None or end is not None):
+            rel = d["t"] - d["t"][0]
+            if start is not None:
+                mask &= rel >= start
+            if end is not None:
+                mask &= rel < end
+        return d[mask]
+
+    def stats(self) -> Dict:
+        d = self.detections
+        frames = np.unique(d["frame"]).size if len(d) else 0
+        per_class = {}
+        for cls in np.unique(d["cls"]):
+            sel = d[d["cls"] == cls]
+            tracks = np.unique(sel["track"][sel["track"] >= 0])
+            per_class[self.names.get(int(cls), str(cls))] = {
+                "detections": int(len(sel)),
+                "tracks": int(tracks.size),
+                "mean_conf": float(sel["conf"].mean()),
+                "median_distance": float(np.nanmedian(sel["distance"])) if np.isfinite(sel["distance"]).any() else None,
+                "announcements": int((self.announcements["cls"] == cls).sum()),
+            }
+        return {
+            "duration_s": float(d["t"][-1] - d["t"][0]) if len(d) else 0.0,
+            "frames_with_detections": int(frames),
+            "detections": int(len(d)),
+            "announcements": int(len(self.announcements)),
+            "per_class": per_class,
+        }
+
+    def replay(self, cooldown: float, conf_threshold: float = 0.0, forget_after: Optional[float] = None,
+               distance_fn=None) -> List[tuple]:
+        """
+        Re-run announcement decisions with different settings, no inference needed.
+        Returns (t, cls) per announcement. conf_threshold can only be raised above
+        the threshold the session was recorded with. forget_after defaults to the
+        value the session was recorded with.
+        """
+        if forget_after is None:
+            forget_after = self.meta.get("forget_after", FORGET_AFTER)
+        d = self.detections
+        d = d[d["conf"] >= conf_threshold]
+        if distance_fn is None:
+            distance_fn = lambda area: 1.0 if area > 0 else None
+        tracker = AnnouncementTracker(distance_fn, cooldown=cooldown, forget_after=forget_after)
+        # frame width only affects the direction wording, not the decisions
+        frame_w = 1
+
+        announced = []
+        prev_frame = None
+        bounds = np.flatnonzero(np.diff(d["frame"])) + 1
+        for rows in np.split(d, bounds) if len(d) else []:
+            dets = []
+            for r in rows:
+                box = (int(r["x1"]), int(r["y1"]), int(r["x2"]), int(r["y2"]))
+                dets.append({
+                    "label": str(int(r["cls"])),
+                    "cls": int(r["cls"]),
+                    "center": ((box[0] + box[2]) // 2, (box[1] + box[3]) // 2),
+                    "area": max(0, box[2] - box[0]) * max(0, box[3] - box[1]),
+                })
+            t = float(rows["t"][0])
+            frame = int(rows["frame"][0])
+            if prev_frame is not None and frame != prev_frame + 1:
+                # frames without (kept) detections have no rows, but live they still ran cleanup
+                tracker.forget(t)
+            prev_frame = frame
+            tracker.update(dets, frame_w, t)
+            announced += [(t, det["cls"]) for det in dets if det.get("announced")]
+        return announced
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect a session log and replay announcement settings.")
+    ap.add_argument("log_dir")
+    ap.add_argument("--cooldown", type=float, nargs="*", default=[], help="ANNOUNCE_COOLDOWN values to try")
+    ap.add_argument("--conf", type=float, nargs="*", default=[], help="CONF_THRESHOLD values to try")
+    args = ap.parse_args()
+
+    log = SessionLog(args.log_dir)
+    stats = log.stats()
+    print(f"{stats['duration_s'] / 60:.1f} min, {stats['frames_with_detections']} frames with detections, "
+          f"{stats['detections']} detections, {stats['announcements']} announcements")
+    print(f"{'class':<15}{'dets':>8}{'tracks':>8}{'conf':>7}{'dist m':>8}{'spoken':>8}")
+    for name, s in sorted(stats["per_class"].items(), key=lambda kv: -kv[1]["detections"]):
+        dist = f"{s['median_distance']:.1f}" if s["median_distance"] is not None else "-"
+        print(f"{name:<15}{s['detections']:>8}{s['tracks']:>8}{s['mean_conf']:>7.2f}{dist:>8}{s['announcements']:>8}")
+
+    cooldowns = args.cooldown or [log.meta.get("announce_cooldown", 2.5)]
+    confs = args.conf or [log.meta.get("conf_threshold", 0.0)]
+    if args.cooldown or args.conf:
+        minutes = max(stats["duration_s"] / 60, 1e-9)
+        print("\nReplayed announcements per minute (rows: conf, cols: cooldown)")
+        print(f"{'':>8}" + "".join(f"{c:>8.1f}" for c in cooldowns))
+        for conf in confs:
+            counts = [len(log.replay(cooldown=c, conf_threshold=conf)) / minutes for c in cooldowns]
+            print(f"{conf:>8.2f}" + "".join(f"{n:>8.1f}" for n in counts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import time
+
+from src.utils import direction_from_center
+
+FORGET_AFTER = 6.0
+
+
+class AnnouncementTracker:
+    """
+    Matches detections to recently seen objects and decides what to announce.
+    An object is re-announced every `cooldown` seconds while it stays in view
+    and forgotten after `forget_after` seconds without an announcement.
+    Track ids count up from `first_id`.
+    """
+    def __init__(self, distance_fn, cooldown: float = 2.5, forget_after: float = FORGET_AFTER, match_px: int = 80,
+                 first_id: int = 0):
+        self.distance_fn = distance_fn
+        self.cooldown = cooldown
+        self.forget_after = forget_after
+        self.match_px = match_px
+        self.tracked = {}
+        self._next_id = first_id
+
+    def update(self, detections, frame_w: int, now: float = None):
+        """
+        Feed one frame of Detector.parse() output, return the phrases to speak.
+        Each detection gets "track" (int id) and "distance" keys filled in, and
+        "announced" when it produced a phrase. Detections without a distance
+        estimate keep track -1.
+        """
+        now = time.time() if now is None else now
+        phrases = []
+        for det in detections:
+            label = det["label"]
+            center = det["center"]
+            direction = direction_from_center(center[0], frame_w)
+            dist_est = self.distance_fn(det["area"])
+            det["track"], det["distance"] = -1, dist_est
+            if dist_est is None:
+                continue
+
+            key = f"{label}_{round(center[0]/50)}_{round(center[1]/50)}"
+            matched_key = None
+            for k, info in self.tracked.items():
+                if not k.startswith(label + "_"):
+                    continue
+                prev_cx, prev_cy = info["last_center"]
+                if abs(prev_cx - center[0]) < self.match_px and abs(prev_cy - center[1]) < self.match_px:
+                    matched_key = k
+                    break
+            if matched_key is None:
+                matched_key = key
+
+            info = self.tracked.get(matched_key)
+            announce = False
+            if info is None:
+                info = {"id": self._next_id, "last_time": now}
+                self._next_id += 1
+                self.tracked[matched_key] = info
+                announce = True
+            elif now - info["last_time"] >= self.cooldown:
+                info["last_time"] = now
+                announce = True
+
+            det["track"] = info["id"]
+
+            self.tracked[matched_key]["last_center"] = center
+
+            if announce:
+                det["announced"] = True
+                phrases.append(f"{label} {direction}, approximately {dist_est:.1f} meters away")
+
+        self.forget(now)
+        return phrases
+
+    def forget(self, now: float):
+        """Drop objects not announced for more than forget_after seconds."""
+        to_delete = [k for k, info in self.tracked.items() if now - info["last_time"] > self.forget_after]
+        for k in to_delete:
+            del self.tracked[k]